@@ -0,0 +1,245 @@
+"""
+流式解析 tool_calls 增量，提前执行工具
+agent.run(..., stream=True) 要等整条消息流完才开始执行工具；
+这里直接调用 DeepSeek 流式 API，某个工具调用的参数一完整就立即执行，
+与模型继续生成的时间重叠，最终消息与提前执行的不一致时取消/丢弃并重新执行。
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from ddgs import DDGS
+
+API_KEY = os.environ["DEEPSEEK_API_KEY"]
+API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+# 工具调用轮数上限，防止模型一直返回 tool_calls
+MAX_TOOL_TURNS = 5
+
+
+def duckduckgo_search(query, max_results=5):
+    """网页搜索"""
+    return json.dumps(DDGS().text(query, max_results=max_results), ensure_ascii=False)
+
+
+def duckduckgo_news(query, max_results=5):
+    """新闻搜索"""
+    return json.dumps(DDGS().news(query, max_results=max_results), ensure_ascii=False)
+
+
+TOOLS = {
+    "duckduckgo_search": duckduckgo_search,
+    "duckduckgo_news": duckduckgo_news,
+}
+
+# 只有无副作用的工具才允许提前执行：最终消息不一致时直接丢弃结果是安全的
+EARLY_DISPATCH_TOOLS = {"duckduckgo_search", "duckduckgo_news"}
+
+TOOL_SCHEMAS = [
+    {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": fn.__doc__,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "搜索关键词"},
+                    "max_results": {"type": "integer", "description": "返回结果数量，默认5"},
+                },
+                "required": ["query"],
+            },
+        },
+    }
+    for name, fn in TOOLS.items()
+]
+
+
+def run_tool(name, arguments):
+    fn = TOOLS.get(name)
+    if fn is None:
+        return f"Unknown tool: {name}"
+    try:
+        return fn(**json.loads(arguments or "{}"))
+    except Exception as e:
+        return f"Error running {name}: {e}"
+
+
+class StreamingToolCallParser:
+    """
+    累积 tool_calls 增量，参数完整时立即把工具提交到线程池。
+
+    判断某个工具调用完整的两种情况：
+    1. index 前进到下一个工具调用，前一个必然已经结束
+    2. 累积的 arguments 已经能解析成完整的 JSON 对象
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.calls = {}  # index -> {"id", "name", "arguments"}
+        self.dispatched = {}  # index -> (name, arguments, future)
+        self.current_index = None
+
+    def feed(self, tool_call_deltas):
+        for delta in tool_call_deltas:
+            index = delta.get("index", 0)
+            if self.current_index is not None and index != self.current_index:
+                self._maybe_dispatch(self.current_index, force=True)
+            self.current_index = index
+
+            call = self.calls.setdefault(index, {"id": None, "name": "", "arguments": ""})
+            if delta.get("id"):
+                call["id"] = delta["id"]
+            function = delta.get("function") or {}
+            if function.get("name"):
+                call["name"] += function["name"]
+            if function.get("arguments"):
+                call["arguments"] += function["arguments"]
+            self._maybe_dispatch(index)
+
+    def _maybe_dispatch(self, index, force=False):
+        if index in self.dispatched:
+            return
+        call = self.calls[index]
+        if call["name"] not in EARLY_DISPATCH_TOOLS:
+            return
+        try:
+            args = json.loads(call["arguments"])
+        except json.JSONDecodeError:
+            if force:
+                print(f"[early] tool call #{index} 参数不完整，等待最终消息")
+            return
+        if not isinstance(args, dict):
+            return
+        future = self.executor.submit(run_tool, call["name"], call["arguments"])
+        self.dispatched[index] = (call["name"], call["arguments"], future)
+        print(f"[early] 提前执行 #{index} {call['name']}({call['arguments']})")
+
+    def reconcile(self):
+        """
+        流结束后与最终的 tool_calls 对齐。
+        名称和参数一致则复用提前执行的 future，否则取消（未开始时）或丢弃结果并重新执行。
+        返回 [(tool_call, future)]，顺序与最终消息一致。
+        """
+        results = []
+        for index in sorted(self.calls):
+            call = self.calls[index]
+            early = self.dispatched.pop(index, None)
+            if early is not None:
+                name, arguments, future = early
+                if name == call["name"] and json.loads(arguments) == _loads_or_none(call["arguments"]):
+                    results.append((call, future))
+                    continue
+                cancelled = future.cancel()
+                print(f"[early] #{index} 与最终消息不一致，{'已取消' if cancelled else '丢弃结果'}并重新执行")
+            results.append((call, self.executor.submit(run_tool, call["name"], call["arguments"])))
+
+        # 最终消息里不存在的提前调用
+        for index, (name, _, future) in self.dispatched.items():
+            cancelled = future.cancel()
+            print(f"[early] #{index} {name} 不在最终消息中，{'已取消' if cancelled else '丢弃结果'}")
+        self.dispatched.clear()
+        return results
+
+    def cancel(self):
+        """流式中途失败时取消所有提前执行的工具"""
+        for _, _, future in self.dispatched.values():
+            future.cancel()
+        self.dispatched.clear()
+
+
+def _loads_or_none(arguments):
+    try:
+        return json.loads(arguments)
+    except json.JSONDecodeError:
+        return None
+
+
+def stream_chat(parser, messages):
+    """流式请求一轮，返回 content，工具在流式过程中已经由 parser 开始执行"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {API_KEY}"
+    }
+    data = {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "tools": TOOL_SCHEMAS,
+        "stream": True,
+    }
+    content = []
+
+    with requests.post(API_URL, json=data, headers=headers, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            line = line.decode("utf-8")
+            if not line or not line.startswith("data: "):
+                continue
+            payload = line[len("data: "):]
+            if payload == "[DONE]":
+                break
+            choice = json.loads(payload)["choices"][0]
+            delta = choice.get("delta") or {}
+            if delta.get("content"):
+                content.append(delta["content"])
+                print(delta["content"], end="", flush=True)
+            if delta.get("tool_calls"):
+                parser.feed(delta["tool_calls"])
+    return "".join(content)
+
+
+def main():
+    messages = [
+        {"role": "system", "content": "你是一个简洁明了、适合初学者的技术助手"},
+        {"role": "user", "content": "What are the latest news in AI?"},
+    ]
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    parser = None
+    try:
+        for _ in range(MAX_TOOL_TURNS):
+            parser = StreamingToolCallParser(executor)
+            start = time.perf_counter()
+            content = stream_chat(parser, messages)
+            stream_done = time.perf_counter()
+            tool_results = parser.reconcile()
+            if not tool_results:
+                print()
+                break
+
+            messages.append({
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": call["arguments"]},
+                    }
+                    for call, _ in tool_results
+                ],
+            })
+            for call, future in tool_results:
+                messages.append({"role": "tool", "tool_call_id": call["id"], "content": future.result()})
+
+            tools_done = time.perf_counter()
+            print(f"\n[timing] 流式生成 {stream_done - start:.2f}s，"
+                  f"流结束后等待工具 {tools_done - stream_done:.2f}s")
+        else:
+            print(f"\n已达到工具调用轮数上限 ({MAX_TOOL_TURNS})，停止")
+    except requests.exceptions.RequestException as e:
+        print(f"\n错误：API 调用失败")
+        print(f"错误信息：{e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"响应状态码：{e.response.status_code}")
+            print(f"响应内容：{e.response.text}")
+    finally:
+        if parser is not None:
+            parser.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()